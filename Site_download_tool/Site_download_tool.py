@@ -2,47 +2,55 @@
 """
 mirror_download.py
 
-递归下载目标目录并在本地重建目录结构，支持多线程并发下载。
-依赖: requests, beautifulsoup4, tqdm
-安装: pip install requests beautifulsoup4 tqdm
+递归下载目标目录并在本地重建目录结构，基于 asyncio 并发下载。
+依赖: httpx[http2], lxml, tqdm
+安装: pip install "httpx[http2]" lxml tqdm
 """
 
 import os
 import sys
-import time
+import json
+import hashlib
+import socket
+import asyncio
 import logging
-from urllib.parse import urljoin, urlparse, unquote, urlsplit
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import Set
-import requests
-from bs4 import BeautifulSoup
+import contextlib
+from urllib.parse import SplitResult, urljoin, urlparse, unquote, urlsplit
+from typing import Callable, Optional, Set, Tuple
+import httpx
+from lxml import etree
 from tqdm import tqdm
 
 # ---------- 配置 ----------
 BASE_URL = "http://cicresearch.ca/IOTDataset/CICEVSE2024%20Dataset/Dataset/"  # 可以修改为其它目录
 LOCAL_ROOT = r"C:\Users\ermao\Desktop\postgraduate_innovate_application_2025\CICI"  # 本地保存根目录
-WORKERS = 8             # 并发数（线程数），可按需调整
+WORKERS = 8             # 并发数（同时进行的下载/连接数），可按需调整
 REQUEST_TIMEOUT = 20
+POOL_TIMEOUT = 300      # 等待空闲连接的最长秒数；大文件下载可能长时间占满连接池，因此比 REQUEST_TIMEOUT 宽松得多
 RETRY = 3
+RETRY_STATUSES = (500, 502, 503, 504)
+CHUNK_SIZE = 1024 * 1024  # 每次写盘的块大小，块越大系统调用和线程池切换越少
 SLEEP_BETWEEN_REQUESTS = 0.0  # 若需放慢速度以礼貌访问，可设置为 >0，比如 0.5
+STATE_FILENAME = "mirror_state.json"  # 保存在本地根目录下，记录每个文件/目录页 URL 的 ETag/Last-Modified 等信息
+TRUST_UNCHANGED_LISTINGS = True  # 目录页与某文件上次确认完整时相同，且该文件大小与记录一致时，不再为它发任何请求
 # ---------- end 配置 ----------
 
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (compatible; mirror_download/1.0; +https://example.org/)",
 }
 
-session = requests.Session()
-session.headers.update(HEADERS)
 logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+# httpx 会在 INFO 级别记录每一个请求，这里只保留警告以上
+logging.getLogger("httpx").setLevel(logging.WARNING)
 
 
 def ensure_dir(path: str):
     os.makedirs(path, exist_ok=True)
 
 
-def is_same_host_and_path(base: str, candidate: str) -> bool:
-    """判断 candidate 是否位于 base 所在主机并且路径以 base 的路径为前缀（避免爬出站点）"""
-    b = urlsplit(base)
+def is_same_host_and_path(b: SplitResult, candidate: str) -> bool:
+    """判断 candidate 是否位于 base 所在主机并且路径以 base 的路径为前缀（避免爬出站点）。
+    每个目录页的每个链接都会调用，base 由调用方预先 urlsplit 一次后传入"""
     c = urlsplit(candidate)
     if b.scheme != c.scheme or b.netloc != c.netloc:
         return False
@@ -50,10 +58,9 @@ def is_same_host_and_path(base: str, candidate: str) -> bool:
     return c.path.startswith(b.path)
 
 
-def normalize_local_path(base_url: str, file_url: str, local_root: str) -> str:
-    """把 file_url 映射为本地路径（相对于 local_root），同时解码 URL 编码"""
+def normalize_local_path(b: SplitResult, file_url: str, local_root: str) -> str:
+    """把 file_url 映射为本地路径（相对于 local_root），同时解码 URL 编码；b 为预先 urlsplit 的 base_url"""
     # compute relative path by removing base_url's path prefix
-    b = urlsplit(base_url)
     f = urlsplit(file_url)
     # relative path portion after base path
     rel = f.path[len(b.path):] if f.path.startswith(b.path) else f.path.lstrip("/")
@@ -62,155 +69,373 @@ def normalize_local_path(base_url: str, file_url: str, local_root: str) -> str:
     return local_path
 
 
-def try_head(url: str):
-    for attempt in range(RETRY):
+@contextlib.asynccontextmanager
+async def fetch(client: httpx.AsyncClient, url: str, headers=None):
+    """以流式方式 GET，连接错误和 5xx 按指数退避重试 RETRY 次；产出尚未读取 body 的响应，退出时自动关闭"""
+    for attempt in range(RETRY + 1):
         try:
-            r = session.head(url, allow_redirects=True, timeout=REQUEST_TIMEOUT)
-            return r
-        except Exception as e:
-            logging.debug(f"HEAD {url} failed (attempt {attempt+1}): {e}")
-            time.sleep(1)
-    return None
+            r = await client.send(client.build_request("GET", url, headers=headers), stream=True)
+        except httpx.TransportError as e:
+            if attempt == RETRY:
+                raise
+            logging.debug(f"GET {url} failed (attempt {attempt+1}): {e}")
+        else:
+            if r.status_code not in RETRY_STATUSES or attempt == RETRY:
+                break
+            await r.aclose()
+        await asyncio.sleep(0.5 * 2 ** attempt)
+    try:
+        yield r
+    finally:
+        await r.aclose()
 
 
-def download_file(url: str, local_path: str, pbar=None):
-    """下载单个文件（支持断点续传检测通过 Content-Length），如果已存在且大小一致则跳过"""
+def load_state(path: str) -> dict:
+    """读取上次运行保存的状态，不存在或损坏时返回空表。
+    文件 URL -> {etag, last_modified, size}（描述已下完的本地文件）及确认它完整时所在目录页的 listing_digest，
+    下载中途时另有 .part 的 {part_etag, part_last_modified}；
+    目录页 URL（以 / 结尾）-> {etag, last_modified, digest, links}"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_state(path: str, state: dict):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, path)
+
+
+def _remember(state: dict, url: str, r: httpx.Response, size: Optional[int]):
+    """记录响应中的校验信息，供下次运行发送条件请求"""
+    entry = state.get(url) or {}
+    entry["etag"] = r.headers.get("ETag", entry.get("etag"))
+    entry["last_modified"] = r.headers.get("Last-Modified", entry.get("last_modified"))
+    entry["size"] = size
+    state[url] = entry
+
+
+def _remember_part(state: dict, url: str, r: httpx.Response, resumed: bool):
+    """记录正在写入的 .part 的校验信息。文件下完之前不能写进 etag/last_modified：
+    否则中途失败后，新版本的校验信息会被拿去续传本地的旧文件，拼出新旧混合的内容"""
+    entry = state.setdefault(url, {})
+    # 206 续传时响应可能不带校验头，沿用 .part 原有的；200 则是全新的内容
+    entry["part_etag"] = r.headers.get("ETag", entry.get("part_etag") if resumed else None)
+    entry["part_last_modified"] = r.headers.get("Last-Modified", entry.get("part_last_modified") if resumed else None)
+
+
+def _commit_part(state: dict, url: str, local_path: str, listing_digest: Optional[str]):
+    """.part 已改名为 local_path，其校验信息此时才成为本地文件的校验信息"""
+    entry = state.setdefault(url, {})
+    entry["etag"] = entry.pop("part_etag", None)
+    entry["last_modified"] = entry.pop("part_last_modified", None)
+    entry["size"] = os.path.getsize(local_path)
+    entry["listing_digest"] = listing_digest
+
+
+def _range_total(r) -> Optional[int]:
+    """从 Content-Range（如 "bytes 100-199/200" 或 "bytes */200"）中取出文件总大小"""
+    cr = r.headers.get("Content-Range", "")
+    total = cr.rpartition("/")[2]
+    return int(total) if total.isdigit() else None
+
+
+async def download_file(client: httpx.AsyncClient, url: str, local_path: str, state: dict, pbar=None,
+                        listing_digest: Optional[str] = None):
+    """下载单个文件，通常每个文件只发一次请求：
+    - 所在目录页的摘要 listing_digest 与上次确认本文件完整时相同，且本地文件与记录的大小一致时，直接跳过；
+    - 有上次中断留下的 .part 时，用记录给它的校验信息发 Range/If-Range 从其末尾续传；
+    - 本地文件没有任何记录（如旧版本下载的）时发 Range 请求，416 说明本地已完整则跳过；
+      若 416 表明远端文件比本地小，则删除本地文件后再发一次请求完整重下；
+    - 本地文件与 state 中记录的大小一致时，带 If-None-Match/If-Modified-Since，304 即跳过；
+    - 本地文件大小与记录不符时，记录的校验信息不属于它，整体重下"""
     ensure_dir(os.path.dirname(local_path))
-    # check if local file exists and size matches Content-Length
-    head = try_head(url)
-    content_length = None
-    if head is not None and head.status_code == 200:
-        content_length = head.headers.get("Content-Length")
-    # If local exists and sizes match, skip
-    if os.path.exists(local_path) and content_length is not None:
-        try:
-            local_size = os.path.getsize(local_path)
-            if local_size == int(content_length):
-                logging.debug(f"Skip (exists & size match): {local_path}")
+    tmp_path = local_path + ".part"
+    entry = state.get(url) or {}
+    etag, last_modified = entry.get("etag"), entry.get("last_modified")
+
+    resume_path = None
+    headers = {}
+    local_size = os.path.getsize(local_path) if os.path.exists(local_path) else None
+    # 只认记录在文件自己条目上的目录页摘要：目录页变化后若本文件下载失败，摘要不会前移，下次仍会检查它
+    trusted = TRUST_UNCHANGED_LISTINGS and listing_digest is not None and entry.get("listing_digest") == listing_digest
+    if trusted and local_size is not None and local_size == entry.get("size"):
+        logging.debug(f"Skip (listing unchanged): {local_path}")
+        if pbar:
+            pbar.update(1)
+        return "skipped"
+    validator = None
+    if os.path.exists(tmp_path):
+        # 上次中断留下的 .part 比本地文件新，用记录给 .part 的校验信息从其末尾续传
+        resume_path = tmp_path
+        part_etag = entry.get("part_etag")
+        validator = part_etag if part_etag and not part_etag.startswith("W/") else entry.get("part_last_modified")
+    elif local_size is not None and not (etag or last_modified):
+        # 没有记录的本地文件（旧版本下载的或服务器不给校验头）：从其末尾请求，416 即已完整
+        resume_path = local_path
+    elif local_size is not None and local_size == entry.get("size"):
+        # 本地文件就是上次下载的版本：条件请求，远端变了才会返回 200 并整体重下
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+    # 其余情况（本地文件大小与记录不符）记录的校验信息不属于它，不能据此续传，整体重下
+    offset = os.path.getsize(resume_path) if resume_path else 0
+    if offset:
+        headers["Range"] = f"bytes={offset}-"
+        # 远端若已变化，If-Range 让服务器直接返回完整的 200，而不是拼接出错误的文件
+        if validator:
+            headers["If-Range"] = validator
+    redownload = False
+    try:
+        async with fetch(client, url, headers=headers) as r:
+            if r.status_code == 304:
+                state[url]["listing_digest"] = listing_digest
+                logging.debug(f"Skip (not modified): {local_path}")
                 if pbar:
                     pbar.update(1)
                 return "skipped"
-        except Exception:
-            pass
-
-    # attempt download with retries
-    for attempt in range(RETRY):
-        try:
-            with session.get(url, stream=True, timeout=REQUEST_TIMEOUT) as r:
-                if r.status_code in (200, 206):
-                    total = r.headers.get("Content-Length")
-                    # write to temp file first
-                    tmp_path = local_path + ".part"
-                    with open(tmp_path, "wb") as f:
-                        for chunk in r.iter_content(chunk_size=1024 * 64):
-                            if chunk:
-                                f.write(chunk)
-                    os.replace(tmp_path, local_path)
-                    logging.info(f"Downloaded: {local_path}")
+            if r.status_code == 416 and offset:
+                total = _range_total(r)
+                if total is not None and total != offset:
+                    # 远端文件比本地小，说明本地内容已过期，丢弃后重新完整下载
+                    logging.warning(f"Size mismatch for {url} (local {offset}, remote {total}), re-downloading")
+                    os.remove(resume_path)
+                    redownload = True
+                elif resume_path == local_path:
+                    _remember(state, url, r, offset)
+                    state[url]["listing_digest"] = listing_digest
+                    logging.debug(f"Skip (exists & complete): {local_path}")
                     if pbar:
                         pbar.update(1)
-                    # optional sleep
-                    if SLEEP_BETWEEN_REQUESTS:
-                        time.sleep(SLEEP_BETWEEN_REQUESTS)
-                    return "downloaded"
+                    return "skipped"
                 else:
-                    logging.warning(f"GET {url} returned status {r.status_code}")
-        except Exception as e:
-            logging.warning(f"Download error {url} (attempt {attempt+1}): {e}")
-            time.sleep(1)
-    logging.error(f"Failed to download after retries: {url}")
+                    # .part 其实已经完整，只差最后的改名
+                    os.replace(tmp_path, local_path)
+                    _commit_part(state, url, local_path, listing_digest)
+            elif r.status_code in (200, 206):
+                if r.status_code == 206:
+                    cr = r.headers.get("Content-Range", "")
+                    if not cr.startswith(f"bytes {offset}-"):
+                        raise ValueError(f"unexpected Content-Range {cr!r}")
+                    if resume_path == local_path:
+                        # 远端文件变长了：把现有文件当作 .part 续写
+                        os.replace(local_path, tmp_path)
+                    mode = "ab"
+                else:
+                    # 200: 服务器不支持 Range、远端已变化或是全新文件，从头写
+                    mode = "wb"
+                _remember_part(state, url, r, resumed=r.status_code == 206)
+                # write to temp file first；写盘是阻塞调用，放到线程池里执行以免卡住事件循环。
+                # aiter_bytes 会把网络上收到的小块攒成 CHUNK_SIZE 再交出，
+                # 大于缓冲区的写入会绕过 BufferedWriter 直接落盘，不再多拷贝一次
+                loop = asyncio.get_running_loop()
+                with open(tmp_path, mode) as f:
+                    async for chunk in r.aiter_bytes(CHUNK_SIZE):
+                        await loop.run_in_executor(None, f.write, chunk)
+                os.replace(tmp_path, local_path)
+                _commit_part(state, url, local_path, listing_digest)
+            else:
+                raise ValueError(f"GET returned status {r.status_code}")
+    except Exception as e:
+        # 连接/5xx 错误已在 fetch 中重试过；留下的 .part 会在下次运行时续传
+        logging.error(f"Failed to download {url}: {e}")
+        if pbar:
+            pbar.update(1)
+        return "failed"
+
+    if redownload:
+        # 必须在 async with 之外重试：416 响应关闭后才会归还连接，
+        # 否则连接池被占满时（如 -w 1）重试会一直等不到空闲连接
+        return await download_file(client, url, local_path, state, pbar, listing_digest)
+
+    logging.info(f"Downloaded: {local_path}")
     if pbar:
         pbar.update(1)
-    return "failed"
+    # optional sleep
+    if SLEEP_BETWEEN_REQUESTS:
+        await asyncio.sleep(SLEEP_BETWEEN_REQUESTS)
+    return "downloaded"
 
 
-def parse_directory_listing(url: str, base_url: str) -> Set[str]:
-    """解析目录页，返回其中所有文件或子目录链接（完整 URL），只保留站内链接"""
+async def parse_directory_listing(client: httpx.AsyncClient, url: str, base_parts: SplitResult,
+                                  state: Optional[dict] = None) -> Tuple[Set[str], Optional[str]]:
+    """解析目录页，返回 (其中所有文件或子目录链接（完整 URL），目录页内容摘要（失败时为 None）)，只保留站内链接。
+    给出 state 时会缓存目录页的解析结果：服务器返回 304 时直接复用，不再下载和解析"""
     results = set()
+    cached = state.get(url) if state is not None else None
+    headers = {}
+    if cached and "links" in cached:
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+    hrefs = []
+    # 目录页多为动态生成、不带 ETag，因此同时记录内容摘要来判断是否变化
+    digest = hashlib.sha1()
+    # 边下载边把原始 bytes 喂给 lxml 的增量解析器：不必先拼出完整的 body，
+    # 也不必在 Python 层解码成 str；只对 <a> 产生事件，href 在 C 层解析后才取出
+    parser = etree.HTMLPullParser(events=("start",), tag="a")
     try:
-        r = session.get(url, timeout=REQUEST_TIMEOUT)
+        async with fetch(client, url, headers=headers) as r:
+            if r.status_code == 304 and headers:
+                return set(cached["links"]), cached.get("digest")
+            if r.status_code != 200:
+                logging.error(f"Directory GET {url} status {r.status_code}")
+                return results, None
+            if r.charset_encoding:
+                parser = etree.HTMLPullParser(events=("start",), tag="a", encoding=r.charset_encoding)
+            async for chunk in r.aiter_bytes():
+                digest.update(chunk)
+                parser.feed(chunk)
+                hrefs.extend(el.get("href") for _, el in parser.read_events())
+            etag, last_modified = r.headers.get("ETag"), r.headers.get("Last-Modified")
     except Exception as e:
         logging.error(f"Failed to GET directory {url}: {e}")
-        return results
+        return results, None
 
-    if r.status_code != 200:
-        logging.error(f"Directory GET {url} status {r.status_code}")
-        return results
+    try:
+        parser.close()
+    except etree.LxmlError as e:
+        logging.error(f"Failed to parse directory {url}: {e}")
+        return results, None
+    hrefs.extend(el.get("href") for _, el in parser.read_events())
 
-    # Try to parse as HTML
-    soup = BeautifulSoup(r.text, "html.parser")
     # find anchor tags
-    for a in soup.find_all("a"):
-        href = a.get("href")
+    for href in hrefs:
         if not href:
             continue
         # ignore parent directory links
         if href in ("../", "/"):
             continue
-        full = urljoin(url, href)
-        # only keep links in the same site and under base_url path
-        if is_same_host_and_path(base_url, full):
-            results.add(full)
-    return results
-
-
-def collect_all_links(start_url: str) -> Set[str]:
-    """广度优先遍历目录，收集所有文件链接（不重复）。返回文件 URL 集合（不包含目录URL结尾/的项）"""
-    to_visit = [start_url]
-    visited = set()
+        try:
+            full = urljoin(url, href)
+            # only keep links in the same site and under base_url path
+            if is_same_host_and_path(base_parts, full):
+                results.add(full)
+        except ValueError as e:
+            # 如 "http://[bad/x" 这类畸形链接，跳过该链接而不是丢掉整个目录页
+            logging.warning(f"Skip malformed link {href!r} in {url}: {e}")
+
+    digest = digest.hexdigest()
+    if state is not None:
+        state[url] = {"etag": etag, "last_modified": last_modified, "digest": digest, "links": sorted(results)}
+    return results, digest
+
+
+async def collect_all_links(client: httpx.AsyncClient, start_url: str, workers: int = WORKERS,
+                            on_file: Optional[Callable[[str, Optional[str]], None]] = None,
+                            state: Optional[dict] = None) -> Set[str]:
+    """由 workers 个协程并发遍历目录，收集所有文件链接（不重复）。返回文件 URL 集合（不包含目录URL结尾/的项）。
+    每发现一个新文件就调用 on_file(url, 所在目录页的摘要)，调用方可以边爬边下载"""
+    to_visit: asyncio.Queue = asyncio.Queue()
+    to_visit.put_nowait(start_url)
+    # 入队即记入 enqueued，避免重复抓取同一目录。
+    # enqueued/file_links 只在事件循环所在的线程中读写（线程池只负责写盘），
+    # 协程之间不会并发修改它们，因此不需要加锁或分片
+    enqueued = {start_url}
     file_links = set()
-
-    while to_visit:
-        cur = to_visit.pop(0)
-        if cur in visited:
-            continue
-        visited.add(cur)
-        logging.info(f"Crawling: {cur}")
-        links = parse_directory_listing(cur, start_url)
-        for link in links:
-            # skip same-page anchors
-            if link.endswith("/"):
-                # directory -> enqueue
-                if link not in visited and link not in to_visit:
-                    to_visit.append(link)
-            else:
-                # Heuristic: treat link as file (not ending with '/')
-                file_links.add(link)
-        # small polite pause
-        if SLEEP_BETWEEN_REQUESTS:
-            time.sleep(SLEEP_BETWEEN_REQUESTS)
+    base_parts = urlsplit(start_url)
+
+    async def crawler():
+        while True:
+            cur = await to_visit.get()
+            try:
+                logging.info(f"Crawling: {cur}")
+                links, listing_digest = await parse_directory_listing(client, cur, base_parts, state)
+                for link in links:
+                    # skip same-page anchors
+                    if link.endswith("/"):
+                        # directory -> enqueue
+                        if link not in enqueued:
+                            enqueued.add(link)
+                            to_visit.put_nowait(link)
+                    elif link not in file_links:
+                        # Heuristic: treat link as file (not ending with '/')
+                        file_links.add(link)
+                        if on_file:
+                            on_file(link, listing_digest)
+                # small polite pause
+                if SLEEP_BETWEEN_REQUESTS:
+                    await asyncio.sleep(SLEEP_BETWEEN_REQUESTS)
+            except Exception as e:
+                # 单个目录出错只放弃该目录；若让异常结束协程，剩余目录可能无人处理，join() 永远等不到
+                logging.error(f"Failed to crawl {cur}: {e}")
+            finally:
+                to_visit.task_done()
+
+    crawlers = [asyncio.create_task(crawler()) for _ in range(workers)]
+    try:
+        await to_visit.join()
+    finally:
+        for t in crawlers:
+            t.cancel()
+        results = await asyncio.gather(*crawlers, return_exceptions=True)
+    # 正常情况下协程只会因取消而结束，其它异常不能悄悄吞掉
+    for res in results:
+        if isinstance(res, Exception):
+            raise res
     return file_links
 
 
-def main(base_url=BASE_URL, local_root=LOCAL_ROOT, workers=WORKERS):
+async def mirror(base_url: str, local_root: str, workers: int):
     ensure_dir(local_root)
-    logging.info(f"Start crawling {base_url}")
-    file_urls = collect_all_links(base_url)
-    logging.info(f"Found {len(file_urls)} files to consider.")
+    state_path = os.path.join(local_root, STATE_FILENAME)
+    state = load_state(state_path)
+    base_parts = urlsplit(base_url)
+    # 单个 AsyncClient 复用连接，连接池上限即并发数。https 站点会协商 HTTP/2，
+    # 目录页等小请求可以在同一条连接上多路复用；TCP_NODELAY 避免小请求被 Nagle 算法延迟
+    transport = httpx.AsyncHTTPTransport(
+        http2=True,
+        limits=httpx.Limits(max_connections=workers, max_keepalive_connections=workers),
+        socket_options=[(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)],
+    )
+    timeout = httpx.Timeout(REQUEST_TIMEOUT, pool=POOL_TIMEOUT)
+    async with httpx.AsyncClient(transport=transport, timeout=timeout, headers=HEADERS,
+                                 follow_redirects=True) as client:
+        # 文件总数在爬取过程中逐步增加，进度条的 total 随之更新
+        pbar = tqdm(total=0, desc="files", unit="file")
+        results_summary = {"downloaded": 0, "skipped": 0, "failed": 0}
+        sem = asyncio.Semaphore(workers)
+        downloads = []
+
+        async def bounded_download(fu: str, listing_digest: Optional[str]):
+            async with sem:
+                lp = normalize_local_path(base_parts, fu, local_root)
+                return await download_file(client, fu, lp, state, pbar, listing_digest)
+
+        def start_download(fu: str, listing_digest: Optional[str]):
+            pbar.total += 1
+            pbar.refresh()
+            downloads.append(asyncio.create_task(bounded_download(fu, listing_digest)))
 
-    # prepare download tasks and progress bar
-    pbar = tqdm(total=len(file_urls), desc="files", unit="file")
-    futures = []
-    results_summary = {"downloaded": 0, "skipped": 0, "failed": 0}
-
-    with ThreadPoolExecutor(max_workers=workers) as ex:
-        for fu in file_urls:
-            lp = normalize_local_path(base_url, fu, local_root)
-            futures.append(ex.submit(download_file, fu, lp, pbar))
-
-        for f in as_completed(futures):
-            res = f.result()
-            if res in results_summary:
-                results_summary[res] += 1
+        try:
+            # 爬取与下载流水线并行：发现文件即开始下载，不必等整棵目录树爬完
+            logging.info(f"Start crawling {base_url}")
+            file_urls = await collect_all_links(client, base_url, workers, on_file=start_download, state=state)
+            logging.info(f"Found {len(file_urls)} files to consider.")
+            for res in await asyncio.gather(*downloads):
+                if res in results_summary:
+                    results_summary[res] += 1
+        finally:
+            # 中途被打断也要保存已获得的校验信息
+            save_state(state_path, state)
 
     pbar.close()
     logging.info(f"Done. Summary: {results_summary}")
 
 
+def main(base_url=BASE_URL, local_root=LOCAL_ROOT, workers=WORKERS):
+    asyncio.run(mirror(base_url, local_root, workers))
+
+
 if __name__ == "__main__":
     import argparse
 
-    parser = argparse.ArgumentParser(description="Mirror a web directory (basic) with multithreaded downloads.")
+    parser = argparse.ArgumentParser(description="Mirror a web directory (basic) with concurrent asyncio downloads.")
     parser.add_argument("--url", "-u", default=BASE_URL, help="Directory URL to mirror")
     parser.add_argument("--out", "-o", default=LOCAL_ROOT, help="Local output root directory")
     parser.add_argument("--workers", "-w", type=int, default=WORKERS, help="Number of concurrent downloads")
@@ -1,7 +1,26 @@
 import os
 import re
-from PyPDF2 import PdfReader
-from PyPDF2.errors import PdfReadError
+import csv
+import mmap
+import hashlib
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+import pypdfium2 as pdfium
+
+# 定义所有需要被替换为'_'的字符：
+# 1. Windows/Linux/Mac的非法文件名字符： [\\/:*?"<>|]
+# 2. 所有的空白字符 (空格, tab, 换行等)： \s
+# 3. 用户额外指定的连字符： -
+#
+# 我们将这些字符合并到一个字符集[]中，并使用 '+' 来匹配一个或多个
+# 这样的连续字符，将它们统一替换为 *单个* '_'
+# 在模块加载时编译一次，避免每个文件都去查 re 的缓存
+_CLEAN_RE = re.compile(r'[\\/:*?"<>|\s-]+')
+
+# --dry-run 时重命名计划默认写到根文件夹下的这个文件
+PLAN_FILENAME = "rename_plan.tsv"
+# 判断重复文件时只对开头这么多字节做哈希（再加上文件大小）
+FINGERPRINT_BYTES = 64 * 1024
 
 def clean_filename(title):
     """
@@ -13,17 +32,7 @@ def clean_filename(title):
     # 将标题转为字符串
     title_str = str(title)
     
-    # 定义所有需要被替换为'_'的字符：
-    # 1. Windows/Linux/Mac的非法文件名字符： [\\/:*?"<>|]
-    # 2. 所有的空白字符 (空格, tab, 换行等)： \s
-    # 3. 用户额外指定的连字符： -
-    #
-    # 我们将这些字符合并到一个字符集[]中，并使用 '+' 来匹配一个或多个
-    # 这样的连续字符，将它们统一替换为 *单个* '_'
-    
-    chars_to_replace_regex = r'[\\/:*?"<>|\s-]+'
-    
-    cleaned_title = re.sub(chars_to_replace_regex, '_', title_str)
+    cleaned_title = _CLEAN_RE.sub('_', title_str)
     
     # 移除可能在开头或结尾产生的 '_'
     cleaned_title = cleaned_title.strip('_')
@@ -35,77 +44,553 @@ def clean_filename(title):
     # 再次清理，防止截断时在末尾留下 '_'
     return final_title.strip('_')
 
-def rename_pdfs_in_folder(root_folder):
+def scan_pdf_dirs(folder):
     """
-    递归遍历文件夹，重命名所有PDF文件。
+    用 os.scandir 递归遍历文件夹，对每个目录产出 (目录路径, 目录下所有名字, 其中的PDF文件名列表)。
+    DirEntry 自带目录读取时得到的类型信息，不需要像 os.walk 那样再逐个 stat 和拼接路径。
+    """
+    names = []
+    pdf_names = []
+    subdirs = []
+    try:
+        with os.scandir(folder) as it:
+            for entry in it:
+                names.append(entry.name)
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+                elif entry.name.lower().endswith('.pdf') and entry.is_file():
+                    pdf_names.append(entry.name)
+    except OSError:
+        # 与 os.walk 一样，忽略无权限访问的目录
+        return
+    yield folder, names, pdf_names
+    for subdir in subdirs:
+        yield from scan_pdf_dirs(subdir)
+
+# --- 只读文件尾部的 trailer 和 /Info 对象来获取标题 ---
+# /Title 就在 trailer 指向的 /Info 字典里，通常只需读取文件末尾和 Info 对象附近的几 KB
+# （Info 被压缩在对象流中时，再多解压这一个对象流），而不必像完整解析那样加载整个文件。
+# 遇到不支持的结构（加密、非 Flate 压缩等）时抛出 ValueError，由 read_pdf_title 退回到 PDFium 完整解析。
+_STARTXREF_RE = re.compile(rb'startxref\s+(\d+)')
+_OBJ_HEADER_RE = re.compile(rb'\s*(\d+)\s+(\d+)\s+obj')
+_XREF_SUBSECTION_RE = re.compile(rb'\s*(\d+)\s+(\d+)[ \t]*\r?\n')
+_XREF_ENTRY_RE = re.compile(rb'(\d{10}) (\d{5}) ([nf])')
+_INFO_RE = re.compile(rb'/Info\s+(\d+)\s+(\d+)\s+R')
+_PREV_RE = re.compile(rb'/Prev\s+(\d+)')
+_XREFSTM_RE = re.compile(rb'/XRefStm\s+(\d+)')
+_LENGTH_RE = re.compile(rb'/Length\s+(\d+)(?![\d\s]*R)')
+_PREDICTOR_RE = re.compile(rb'/Predictor\s+(\d+)')
+_COLUMNS_RE = re.compile(rb'/Columns\s+(\d+)')
+_W_RE = re.compile(rb'/W\s*\[\s*(\d+)\s+(\d+)\s+(\d+)\s*\]')
+_INDEX_RE = re.compile(rb'/Index\s*\[([\d\s]*)\]')
+_SIZE_RE = re.compile(rb'/Size\s+(\d+)')
+_FILTER_RE = re.compile(rb'/Filter\s*(\[[^\]]*\]|/\w+)')
+_N_RE = re.compile(rb'/N\s+(\d+)')
+_FIRST_RE = re.compile(rb'/First\s+(\d+)')
+_DICT_TOKEN_RE = re.compile(rb'[\s\x00]*(?:(<<|>>|\[|\])|(/[^\s\x00/<>\[\]()%{}]*)|(\()|(<)|(%)|([^\s\x00/<>\[\]()%{}]+))')
+_ESCAPES = {ord('n'): b'\n', ord('r'): b'\r', ord('t'): b'\t', ord('b'): b'\b', ord('f'): b'\f'}
+# PDFDocEncoding 中与 latin-1 不同的字符
+_PDFDOC_TABLE = str.maketrans(dict(zip(
+    [chr(c) for c in range(0x18, 0x20)] + [chr(c) for c in range(0x80, 0x9f)] + ['\xa0'],
+    '\u02d8\u02c7\u02c6\u02d9\u02dd\u02db\u02da\u02dc'
+    '\u2022\u2020\u2021\u2026\u2014\u2013\u0192\u2044\u2039\u203a\u2212\u2030\u201e\u201c\u201d'
+    '\u2018\u2019\u201a\u2122\ufb01\ufb02\u0141\u0152\u0160\u0178\u017d\u0131\u0142\u0153\u0161\u017e'
+    '\u20ac',
+)))
+
+def _read_literal_string(data, pos):
+    """
+    解析从 data[pos] == '(' 开始的字面量字符串，返回 (字节串, 结束位置)。
+    """
+    out = bytearray()
+    depth = 1
+    i = pos + 1
+    n = len(data)
+    while i < n:
+        c = data[i]
+        if c == 0x5c:  # 反斜杠转义
+            i += 1
+            if i >= n:
+                break
+            c = data[i]
+            if c in _ESCAPES:
+                out += _ESCAPES[c]
+            elif 0x30 <= c <= 0x37:  # \ddd 八进制
+                j = i
+                while j < n and j < i + 3 and 0x30 <= data[j] <= 0x37:
+                    j += 1
+                out.append(int(data[i:j], 8) & 0xff)
+                i = j
+                continue
+            elif c == 0x0d:  # 反斜杠 + 换行 表示续行
+                if i + 1 < n and data[i + 1] == 0x0a:
+                    i += 1
+            elif c != 0x0a:
+                out.append(c)
+        elif c == 0x28:
+            depth += 1
+            out.append(c)
+        elif c == 0x29:
+            depth -= 1
+            if depth == 0:
+                return bytes(out), i + 1
+            out.append(c)
+        else:
+            out.append(c)
+        i += 1
+    raise ValueError("unterminated string")
+
+def _decode_pdf_text(raw):
+    """
+    按 PDF 文本字符串的规则解码：带 BOM 的 UTF-16BE/UTF-8，否则为 PDFDocEncoding。
+    """
+    if raw.startswith(b'\xfe\xff'):
+        return raw[2:].decode('utf-16-be', errors='replace')
+    if raw.startswith(b'\xef\xbb\xbf'):
+        return raw[3:].decode('utf-8', errors='replace')
+    return raw.decode('latin-1').translate(_PDFDOC_TABLE)
+
+def _find_title_in_dict(data, pos):
+    """
+    从 data[pos] 开始逐个扫描 Info 字典的记号，返回 /Title 的原始字节串，没有 /Title 时返回 None。
+    字符串会被完整跳过，因此标题等字段里出现的 "/Title" 或括号不会干扰扫描。
+    """
+    depth = 0
+    is_title = False
+    while True:
+        m = _DICT_TOKEN_RE.match(data, pos)
+        if not m or m.end() == pos:
+            raise ValueError("bad dictionary")
+        pos = m.end()
+        delim, name, lit, hexstr, comment, _ = m.groups()
+        if is_title:
+            # 上一个记号是 /Title，这就是它的值
+            if lit:
+                return _read_literal_string(data, pos - 1)[0]
+            if hexstr:
+                end = data.find(b'>', pos)
+                if end < 0:
+                    raise ValueError("unterminated hex string")
+                digits = re.sub(rb'\s', b'', data[pos:end])
+                if len(digits) % 2:
+                    digits += b'0'
+                return bytes.fromhex(digits.decode('ascii'))
+            # 间接引用等情况交给完整解析
+            raise ValueError("unsupported /Title value")
+        if delim in (b'<<', b'['):
+            depth += 1
+        elif delim in (b'>>', b']'):
+            depth -= 1
+            if depth == 0:
+                return None
+        elif lit:
+            pos = _read_literal_string(data, pos - 1)[1]
+        elif hexstr:
+            pos = data.find(b'>', pos) + 1
+            if pos == 0:
+                raise ValueError("unterminated hex string")
+        elif comment:
+            pos = data.find(b'\n', pos) + 1
+            if pos == 0:
+                raise ValueError("unterminated comment")
+        elif depth == 1 and name == b'/Title':
+            is_title = True
+
+def _png_unpredict(data, columns, row):
+    """
+    对 PNG 预测器编码的 xref 流解码到第 row 行为止，返回该行。
+    """
+    width = columns + 1
+    prev = bytearray(columns)
+    for r in range(row + 1):
+        line = data[r * width:(r + 1) * width]
+        if len(line) != width:
+            raise ValueError("truncated xref stream")
+        kind, cur = line[0], bytearray(line[1:])
+        if kind == 1:
+            for i in range(1, columns):
+                cur[i] = (cur[i] + cur[i - 1]) & 0xff
+        elif kind == 2:
+            for i in range(columns):
+                cur[i] = (cur[i] + prev[i]) & 0xff
+        elif kind != 0:
+            raise ValueError("unsupported PNG predictor")
+        prev = cur
+    return bytes(prev)
+
+def _object_at(m, offset, num):
+    """
+    确认 offset 处是对象 num 的开头，返回 "n g obj" 之后的位置。
+    """
+    header = _OBJ_HEADER_RE.match(m, offset)
+    if not header or int(header.group(1)) != num:
+        raise ValueError(f"bad offset for object {num}")
+    return header.end()
+
+def _read_stream(m, pos):
+    """
+    读取从 pos（"n g obj" 之后）开始的流对象，返回 (流字典字节串, 解压后的数据)。
+    """
+    stream_pos = m.find(b'stream', pos, pos + 4096)
+    if stream_pos < 0:
+        raise ValueError("stream not found")
+    info = m[pos:stream_pos]
+    data_pos = stream_pos + 6
+    if m[data_pos:data_pos + 2] == b'\r\n':
+        data_pos += 2
+    elif m[data_pos:data_pos + 1] in (b'\r', b'\n'):
+        data_pos += 1
+    length = _LENGTH_RE.search(info)
+    if length:
+        raw = m[data_pos:data_pos + int(length.group(1))]
+    else:
+        raw = m[data_pos:m.find(b'endstream', data_pos)]
+    filter_match = _FILTER_RE.search(info)
+    filters = re.findall(rb'/(\w+)', filter_match.group(1)) if filter_match else []
+    if not filters:
+        return info, raw
+    if filters != [b'FlateDecode']:
+        raise ValueError("unsupported stream filter")
+    return info, zlib.decompressobj().decompress(raw)
+
+def _lookup_xref_table(m, xref_pos, num):
+    """
+    在传统 xref 表中查找对象 num，返回 (xref 记录或 None, trailer 字典字节串)。
+    """
+    pos = xref_pos + 4
+    entry = None
+    while True:
+        sub = _XREF_SUBSECTION_RE.match(m, pos)
+        if not sub:
+            break
+        start, count = int(sub.group(1)), int(sub.group(2))
+        pos = sub.end()
+        if entry is None and num is not None and start <= num < start + count:
+            # 每条记录固定 20 字节
+            match = _XREF_ENTRY_RE.match(m, pos + (num - start) * 20)
+            if not match:
+                raise ValueError("bad xref entry")
+            if match.group(3) == b'n':
+                entry = (1, int(match.group(1)), int(match.group(2)))
+        pos += count * 20
+    trailer_pos = m.find(b'trailer', pos, pos + 64)
+    if trailer_pos < 0:
+        raise ValueError("trailer not found")
+    trailer_end = m.find(b'startxref', trailer_pos)
+    return entry, m[trailer_pos:trailer_end if trailer_end > 0 else trailer_pos + 4096]
+
+def _lookup_xref_stream(m, xref_pos, num):
+    """
+    在交叉引用流（PDF 1.5+）中查找对象 num，返回 (xref 记录或 None, 流字典字节串)。
+    """
+    header = _OBJ_HEADER_RE.match(m, xref_pos)
+    if not header:
+        raise ValueError("xref not found")
+    pos = header.end()
+    if num is None:
+        # 只需要 trailer 信息时不必解压
+        stream_pos = m.find(b'stream', pos, pos + 4096)
+        info = m[pos:stream_pos] if stream_pos >= 0 else b''
+        if not re.search(rb'/Type\s*/XRef', info):
+            raise ValueError("not an xref stream")
+        return None, info
+    info, data = _read_stream(m, pos)
+    if not re.search(rb'/Type\s*/XRef', info):
+        raise ValueError("not an xref stream")
+
+    w = _W_RE.search(info)
+    if not w:
+        raise ValueError("bad /W")
+    widths = [int(x) for x in w.groups()]
+    index = _INDEX_RE.search(info)
+    if index:
+        ranges = [int(x) for x in index.group(1).split()]
+    else:
+        ranges = [0, int(_SIZE_RE.search(info).group(1))]
+    row = 0
+    for start, count in zip(ranges[::2], ranges[1::2]):
+        if start <= num < start + count:
+            row += num - start
+            break
+        row += count
+    else:
+        return None, info
+
+    entry_size = sum(widths)
+    predictor = _PREDICTOR_RE.search(info)
+    if predictor and int(predictor.group(1)) >= 10:
+        columns = _COLUMNS_RE.search(info)
+        if not columns or int(columns.group(1)) != entry_size:
+            raise ValueError("unsupported predictor columns")
+        raw_entry = _png_unpredict(data, entry_size, row)
+    elif predictor and int(predictor.group(1)) != 1:
+        raise ValueError("unsupported predictor")
+    else:
+        raw_entry = data[row * entry_size:(row + 1) * entry_size]
+        if len(raw_entry) != entry_size:
+            raise ValueError("truncated xref stream")
+
+    fields = []
+    pos = 0
+    for width in widths:
+        fields.append(int.from_bytes(raw_entry[pos:pos + width], 'big'))
+        pos += width
+    # 类型字段宽度为 0 时默认为 1；1 = 普通对象（偏移量），2 = 位于对象流中（对象流编号, 序号）
+    kind = fields[0] if widths[0] else 1
+    if kind not in (1, 2):
+        return None, info
+    return (kind, fields[1], fields[2]), info
+
+def _lookup_xref(m, xref_pos, num):
+    if m[xref_pos:xref_pos + 4] == b'xref':
+        return _lookup_xref_table(m, xref_pos, num)
+    return _lookup_xref_stream(m, xref_pos, num)
+
+def _find_object(m, xref_pos, num):
+    """
+    从最新的 xref 节开始，沿 /XRefStm 和 /Prev 依次查找对象 num 的 xref 记录。
+    """
+    pending = [xref_pos]
+    seen = set()
+    while pending:
+        xref_pos = pending.pop(0)
+        if xref_pos in seen or xref_pos >= len(m):
+            raise ValueError("bad xref offset")
+        seen.add(xref_pos)
+        entry, trailer = _lookup_xref(m, xref_pos, num)
+        if entry:
+            return entry
+        xrefstm = _XREFSTM_RE.search(trailer)
+        if xrefstm:
+            pending.insert(0, int(xrefstm.group(1)))
+        prev = _PREV_RE.search(trailer)
+        if prev:
+            pending.append(int(prev.group(1)))
+    raise ValueError(f"object {num} not found")
+
+def _read_title_from_trailer(m):
+    """
+    只解析 trailer 与 /Info 对象，返回标题字节串（没有 /Title 时为 None）。
     """
+    pos = m.rfind(b'startxref', max(0, len(m) - 1024))
+    match = _STARTXREF_RE.match(m, pos) if pos >= 0 else None
+    if not match:
+        raise ValueError("startxref not found")
+    xref_pos = int(match.group(1))
+    if xref_pos >= len(m):
+        raise ValueError("bad xref offset")
+
+    # 最新的 trailer 决定 Info 是哪个对象；加密文件的字符串需要解密，交给 PDFium
+    trailer = _lookup_xref(m, xref_pos, None)[1]
+    if b'/Encrypt' in trailer:
+        raise ValueError("encrypted")
+    info = _INFO_RE.search(trailer)
+    if not info:
+        return None
+    info_num = int(info.group(1))
+
+    entry = _find_object(m, xref_pos, info_num)
+    if entry[0] == 1:
+        return _find_title_in_dict(m, _object_at(m, entry[1], info_num))
+
+    # Info 字典被压缩在对象流里：只解压这一个对象流，按头部的 "对象号 偏移量" 表定位
+    stm_num, index = entry[1], entry[2]
+    stm_entry = _find_object(m, xref_pos, stm_num)
+    if stm_entry[0] != 1:
+        raise ValueError("bad object stream entry")
+    stm_info, data = _read_stream(m, _object_at(m, stm_entry[1], stm_num))
+    n, first = _N_RE.search(stm_info), _FIRST_RE.search(stm_info)
+    if not n or not first or _PREDICTOR_RE.search(stm_info) or index >= int(n.group(1)):
+        raise ValueError("unsupported object stream")
+    first = int(first.group(1))
+    pairs = data[:first].split()
+    if int(pairs[2 * index]) != info_num:
+        raise ValueError("bad object stream index")
+    return _find_title_in_dict(data, first + int(pairs[2 * index + 1]))
+
+def read_pdf_title(full_path):
+    """
+    读取PDF的 /Title 元数据。先尝试只读 trailer 和 /Info 对象，
+    解析失败时退回 PDFium（在 C 层解析，也比 PyPDF2 快得多）。
+    """
+    try:
+        with open(full_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+            raw = _read_title_from_trailer(m)
+        return None if raw is None else _decode_pdf_text(raw)
+    except (OSError, ValueError, IndexError, zlib.error):
+        pass
+
+    pdf = pdfium.PdfDocument(full_path)
+    try:
+        return pdf.get_metadata_dict().get('Title')
+    finally:
+        pdf.close()
+
+def _read_title_task(full_path):
+    """
+    在子进程中执行，返回 (title, 错误信息)。
+    异常在这里就转成错误信息，避免一个坏文件中断整个 map。
+    """
+    try:
+        return read_pdf_title(full_path), None
+    except pdfium.PdfiumError:
+        return None, "文件损坏或无法读取"
+    except Exception as e:
+        return None, f"发生未知错误: {e}"
+
+def _fingerprint(path, cache):
+    """
+    文件大小 + 开头 FINGERPRINT_BYTES 字节的 SHA-256，用来快速判断两个PDF是否是同一份文件。
+    无法读取（例如同名的是文件夹）时返回 None。
+    """
+    if path not in cache:
+        try:
+            with open(path, 'rb') as f:
+                head = f.read(FINGERPRINT_BYTES)
+                size = os.fstat(f.fileno()).st_size
+            cache[path] = (size, hashlib.sha256(head).digest())
+        except OSError:
+            cache[path] = None
+    return cache[path]
+
+def plan_renames(root_folder):
+    """
+    递归遍历文件夹，为所有PDF计算新文件名，但不改动磁盘上的文件。
+    解析元数据是 CPU 密集的，交给进程池并行完成（PDFium 不是线程安全的，不能用线程池）；
+    新文件名则在主进程中按顺序分配，避免多个进程抢同一个后缀。
+    返回 (重命名计划 [(旧路径, 新路径), ...], 扫描到的PDF数量)，路径均为绝对路径，
+    这样计划文件在其它工作目录下执行 --apply 时仍然有效。
+    """
+    root_folder = os.path.abspath(root_folder)
     print(f"开始扫描文件夹: {root_folder}\n")
-    processed_count = 0
+    plan = []
+
+    # 递归遍历所有子文件夹，先收集所有PDF
+    tasks = []
+    # 每个目录下已有的名字 -> 按计划最终占用该名字的文件，用于在内存中检查重名，不必逐个 stat
+    # （normcase 让 Windows 上的比较与文件系统一样不区分大小写）
+    existing_by_dir = {}
+    fingerprints = {}
+    for dirpath, names, pdf_names in scan_pdf_dirs(root_folder):
+        existing_by_dir[dirpath] = {os.path.normcase(n): os.path.join(dirpath, n) for n in names}
+        tasks.extend((dirpath, filename) for filename in pdf_names)
+
+    with ProcessPoolExecutor() as ex:
+        full_paths = [os.path.join(dirpath, filename) for dirpath, filename in tasks]
+        results = ex.map(_read_title_task, full_paths, chunksize=16)
+
+        for (dirpath, filename), full_path, (paper_title, error) in zip(tasks, full_paths, results):
+            if error:
+                print(f"[失败] {filename} ({error})")
+                continue
+
+            cleaned_title = clean_filename(paper_title)
+
+            if not cleaned_title:
+                print(f"[跳过] {filename} (未找到有效的Title元数据)")
+                continue
+
+            # --- 准备新文件名 ---
+            new_filename = cleaned_title + ".pdf"
+            new_full_path = os.path.join(dirpath, new_filename)
+
+            # 检查新文件名是否与旧文件名相同
+            if full_path == new_full_path:
+                print(f"[跳过] {filename} (已是正确名称)")
+                continue
+
+            # 检查新文件名是否已存在（避免覆盖）
+            existing = existing_by_dir[dirpath]
+            counter = 1
+            base_new_name = cleaned_title
+            duplicate_of = None
+            # 占用者就是本文件时（Windows 上只改大小写的重命名）名字视为空闲
+            while existing.get(os.path.normcase(new_filename), full_path) != full_path:
+                # 标题相同的往往是同一篇论文的重复副本，与其生成 _(1) 之类的文件，不如直接指出来
+                occupant = existing[os.path.normcase(new_filename)]
+                fingerprint = _fingerprint(full_path, fingerprints)
+                if fingerprint is not None and fingerprint == _fingerprint(occupant, fingerprints):
+                    duplicate_of = occupant
+                    break
+                print(f"[警告] {new_filename} 已存在。尝试添加后缀...")
+                new_filename = f"{base_new_name}_({counter}).pdf" # 后缀也用_
+                new_full_path = os.path.join(dirpath, new_filename)
+                counter += 1
+                # 安全退出，防止无限循环
+                if counter > 50:
+                    print(f"[失败] 无法为 {filename} 找到一个不冲突的名称")
+                    break
+
+            if duplicate_of:
+                print(f"[重复] {filename} 与 {os.path.basename(duplicate_of)} 内容相同，未重命名（可手动删除）")
+                continue
+
+            if existing.get(os.path.normcase(new_filename), full_path) != full_path:
+                continue
+
+            # 按计划更新目录中的名字，后续文件据此避开冲突
+            existing.pop(os.path.normcase(filename), None)
+            existing[os.path.normcase(new_filename)] = full_path
+            plan.append((full_path, new_full_path))
+
+    return plan, len(tasks)
+
+def write_rename_plan(plan, plan_path):
+    """
+    把重命名计划写成 TSV（旧路径<TAB>新路径），供检查后再用 --apply 执行。
+    """
+    with open(plan_path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f, delimiter='\t')
+        writer.writerow(['old_path', 'new_path'])
+        writer.writerows(plan)
+
+def read_rename_plan(plan_path):
+    with open(plan_path, encoding='utf-8', newline='') as f:
+        reader = csv.reader(f, delimiter='\t')
+        next(reader, None)  # 表头
+        return [(row[0], row[1]) for row in reader if len(row) >= 2]
+
+def apply_renames(plan):
+    """
+    按计划依次重命名，不再重新解析PDF。返回成功重命名的数量。
+    """
     renamed_count = 0
-    failed_count = 0
-
-    # os.walk 会递归遍历所有子文件夹
-    for dirpath, dirnames, filenames in os.walk(root_folder):
-        for filename in filenames:
-            
-            # 检查文件是否为PDF
-            if filename.lower().endswith('.pdf'):
-                processed_count += 1
-                full_path = os.path.join(dirpath, filename)
-                
-                try:
-                    # 打开PDF文件并读取元数据
-                    with open(full_path, 'rb') as f:
-                        reader = PdfReader(f)
-                        meta = reader.metadata
-                        
-                        # 尝试获取 /Title 字段
-                        paper_title = meta.get('/Title')
-                    
-                    cleaned_title = clean_filename(paper_title)
-                    
-                    if not cleaned_title:
-                        print(f"[跳过] {filename} (未找到有效的Title元数据)")
-                        continue
-
-                    # --- 准备新文件名 ---
-                    new_filename = cleaned_title + ".pdf"
-                    new_full_path = os.path.join(dirpath, new_filename)
-                    
-                    # 检查新文件名是否与旧文件名相同
-                    if full_path == new_full_path:
-                        print(f"[跳过] {filename} (已是正确名称)")
-                        continue
-                        
-                    # 检查新文件名是否已存在（避免覆盖）
-                    counter = 1
-                    base_new_name = cleaned_title
-                    while os.path.exists(new_full_path):
-                        print(f"[警告] {new_filename} 已存在。尝试添加后缀...")
-                        new_filename = f"{base_new_name}_({counter}).pdf" # 后缀也用_
-                        new_full_path = os.path.join(dirpath, new_filename)
-                        counter += 1
-                        # 安全退出，防止无限循环
-                        if counter > 50:
-                            print(f"[失败] 无法为 {filename} 找到一个不冲突的名称")
-                            break
-                    
-                    if os.path.exists(new_full_path):
-                         failed_count += 1
-                         continue
-
-                    # --- 执行重命名 ---
-                    os.rename(full_path, new_full_path)
-                    print(f"[成功] {filename} -> {new_filename}")
-                    renamed_count += 1
-
-                except PdfReadError:
-                    print(f"[失败] {filename} (文件损坏或无法读取)")
-                    failed_count += 1
-                except Exception as e:
-                    print(f"[失败] {filename} (发生未知错误: {e})")
-                    failed_count += 1
-                    
+    for full_path, new_full_path in plan:
+        filename = os.path.basename(full_path)
+        new_filename = os.path.basename(new_full_path)
+        # 计划生成后目录可能有变化，不覆盖已存在的文件（不区分大小写的文件系统上，只改大小写时找到的就是源文件本身）
+        if os.path.exists(new_full_path) and not (os.path.exists(full_path)
+                                                  and os.path.samefile(full_path, new_full_path)):
+            print(f"[失败] {filename} ({new_filename} 已存在)")
+            continue
+        try:
+            os.rename(full_path, new_full_path)
+        except OSError as e:
+            print(f"[失败] {filename} (发生未知错误: {e})")
+            continue
+        print(f"[成功] {filename} -> {new_filename}")
+        renamed_count += 1
+    return renamed_count
+
+def rename_pdfs_in_folder(root_folder, dry_run=False, plan_path=None):
+    """
+    递归遍历文件夹，重命名所有PDF文件。
+    dry_run 为 True 时只把重命名计划写到 plan_path，不改动任何文件。
+    """
+    plan, processed_count = plan_renames(root_folder)
+
+    if dry_run:
+        plan_path = plan_path or os.path.join(root_folder, PLAN_FILENAME)
+        write_rename_plan(plan, plan_path)
+        print("\n--- 扫描完毕（未重命名任何文件）---")
+        print(f"总共扫描PDF: {processed_count}")
+        print(f"计划重命名: {len(plan)}")
+        print(f"重命名计划已写入: {plan_path}")
+        return
+
+    print()
+    renamed_count = apply_renames(plan)
+
     print("\n--- 处理完毕 ---")
     print(f"总共扫描PDF: {processed_count}")
     print(f"成功重命名: {renamed_count}")
@@ -114,7 +599,9 @@ def rename_pdfs_in_folder(root_folder):
 
 # --- 脚本主入口 ---
 if __name__ == "__main__":
-    # 1. 将这里的路径修改为你的PDF论文根文件夹
+    import argparse
+
+    # 1. 将这里的路径修改为你的PDF论文根文件夹（也可以在命令行中传入）
     # ！！！重要！！！
     # Windows 路径示例: r"C:\Users\YourName\Documents\Papers"
     # (注意前面的 r)
@@ -122,11 +609,28 @@ if __name__ == "__main__":
     # macOS/Linux 路径示例: "/Users/YourName/Documents/Papers"
     
     folder_path = r"D:\xupt\paper"
+
+    parser = argparse.ArgumentParser(description="按PDF元数据中的标题重命名文件夹中的论文。")
+    parser.add_argument("folder", nargs="?", default=folder_path, help="PDF论文根文件夹")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--dry-run", action="store_true", help="只生成重命名计划文件，不改动任何文件")
+    mode.add_argument("--apply", action="store_true", help="执行之前 --dry-run 生成的重命名计划，不再重新解析PDF")
+    parser.add_argument("--plan", help=f"重命名计划文件路径（默认: <folder>/{PLAN_FILENAME}）")
+    args = parser.parse_args()
+    if args.plan and not (args.dry_run or args.apply):
+        parser.error("--plan 只能与 --dry-run 或 --apply 一起使用")
     
     # 2. 检查路径是否设置
 
-    if not os.path.isdir(folder_path):
-        print(f"错误：路径 '{folder_path}' 不存在或不是一个文件夹。")
+    if not os.path.isdir(args.folder):
+        print(f"错误：路径 '{args.folder}' 不存在或不是一个文件夹。")
+    elif args.apply:
+        plan_path = args.plan or os.path.join(args.folder, PLAN_FILENAME)
+        if not os.path.isfile(plan_path):
+            print(f"错误：重命名计划 '{plan_path}' 不存在，请先使用 --dry-run 生成。")
+        else:
+            renamed_count = apply_renames(read_rename_plan(plan_path))
+            print(f"\n--- 处理完毕 ---\n成功重命名: {renamed_count}")
     else:
         # 3. 运行脚本
-        rename_pdfs_in_folder(folder_path)
\ No newline at end of file
+        rename_pdfs_in_folder(args.folder, dry_run=args.dry_run, plan_path=args.plan)